@@ -0,0 +1,79 @@
+import hashlib
+import json
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+
+
+def get_data_version(scope):
+    """ Версия справочных данных; меняется при каждом их изменении """
+    return cache.get_or_set(
+        f'data-version:{scope}', time.time_ns,
+        settings.REFERENCE_CACHE_TIMEOUT)
+
+
+def bump_data_version(scope):
+    cache.set(f'data-version:{scope}', time.time_ns(),
+              settings.REFERENCE_CACHE_TIMEOUT)
+
+
+class ReferenceCacheMixin:
+    """ Кеширование ответов со справочными данными.
+
+    Ответ хранится в кеше под ключом из версии данных и URL запроса и
+    отдаётся с ETag — хешем самих данных, поэтому у всех воркеров он
+    одинаков для одинаковых данных. Если у клиента актуальная копия,
+    ответ превращается в 304 Not Modified.
+    """
+    cache_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs))
+
+    def cached_response(self, request, get_response):
+        version = get_data_version(self.cache_scope)
+        key = 'reference:' + hashlib.md5(
+            f'{self.cache_scope}:{version}:{request.accepted_renderer.format}'
+            f':{request.get_full_path()}'.encode()
+        ).hexdigest()
+        cached = cache.get(key)
+        metrics.cache_result(self.cache_scope, cached is not None)
+        if cached is None:
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (response.data, self.get_etag(request, response.data))
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        data, etag = cached
+        headers = {
+            'ETag': etag,
+            'Cache-Control':
+                f'public, max-age={settings.REFERENCE_CACHE_MAX_AGE}',
+        }
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified[header] = value
+            return not_modified
+        return Response(data, headers=headers)
+
+    @staticmethod
+    def get_etag(request, data):
+        body = json.dumps(data, ensure_ascii=False, sort_keys=True,
+                          default=str)
+        digest = hashlib.md5(
+            f'{request.accepted_renderer.format}:{body}'.encode()
+        ).hexdigest()
+        return f'"{digest}"'
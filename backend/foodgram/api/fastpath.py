@@ -0,0 +1,82 @@
+""" Сборка ответов списков без сериализаторов DRF.
+
+Функции повторяют вывод RecipeSerializer, TagSerializer и
+IngredientSerializer поле в поле и в том же порядке ключей, но строят
+словари напрямую из загруженных строк, без создания полей
+сериализатора на каждую запись. При изменении сериализаторов
+эти функции нужно менять вместе с ними.
+"""
+from users.models import Subscription
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+
+
+def image_url(file, request):
+    """ То же, что ImageField.to_representation """
+    if not file:
+        return None
+    url = file.url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_subscribed_ids(request):
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    return set(Subscription.objects.filter(user=user).values_list(
+        'author_id', flat=True))
+
+
+def recipe_to_dict(recipe, request, subscribed_ids):
+    """ Представление рецепта как у RecipeSerializer """
+    author = recipe.author
+    return {
+        'id': recipe.id,
+        'tags': [
+            {'id': tag.id, 'name': tag.name,
+             'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'author': {
+            'id': author.id,
+            'email': author.email,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': author.id in subscribed_ids,
+        },
+        'ingredients': [
+            {'id': item.ingredient.id, 'name': item.ingredient.name,
+             'amount': item.amount,
+             'measurement_unit': item.ingredient.measurement_unit}
+            for item in recipe.recipeingredient_set.all()
+        ],
+        'is_favorited': recipe.is_favorited,
+        'is_in_shopping_cart': recipe.is_in_shopping_cart,
+        'name': recipe.name,
+        'image': image_url(recipe.image, request),
+        'image_card': image_url(recipe.image_card or recipe.image, request),
+        'image_detail': image_url(
+            recipe.image_detail or recipe.image, request),
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def recipes_to_list(recipes, request, extra_fields=()):
+    """ Список рецептов с аннотациями is_favorited/is_in_shopping_cart.
+
+    extra_fields — аннотации, добавляемые в конец каждой записи
+    (как coverage у RecipeCoverageSerializer).
+    """
+    subscribed_ids = get_subscribed_ids(request)
+    data = []
+    for recipe in recipes:
+        item = recipe_to_dict(recipe, request, subscribed_ids)
+        for field in extra_fields:
+            item[field] = getattr(recipe, field)
+        data.append(item)
+    return data
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Recipes
+from users.models import Subscription
+from . import metrics
+
+
+def feed_head_key(user_id):
+    return f'feed-head:{user_id}'
+
+
+def followed_authors(user):
+    """ Подзапрос id авторов, на которых подписан user """
+    return Subscription.objects.filter(user=user).values('author_id')
+
+
+def get_feed_head(user, ordering):
+    """ id первых RECIPE_FEED_HEAD_SIZE рецептов ленты user.
+
+    Список кешируется на RECIPE_FEED_CACHE_TIMEOUT секунд и
+    сбрасывается, когда автор из подписок публикует или удаляет рецепт,
+    а также при подписке и отписке. None, если кеш ленты выключен.
+    """
+    if not settings.RECIPE_FEED_CACHE_TIMEOUT:
+        return None
+    key = feed_head_key(user.id)
+    head = cache.get(key)
+    metrics.cache_result('feed_head', head is not None)
+    if head is None:
+        head = list(Recipes.objects.filter(
+            author_id__in=followed_authors(user)
+        ).order_by(*ordering).values_list(
+            'pk', flat=True)[:settings.RECIPE_FEED_HEAD_SIZE])
+        cache.set(key, head, settings.RECIPE_FEED_CACHE_TIMEOUT)
+    return head
+
+
+def reset_feed_heads(user_ids):
+    cache.delete_many([feed_head_key(user_id) for user_id in user_ids])
+
+
+def reset_followers_feed_heads(author_id):
+    """ Сбрасывает закешированные ленты подписчиков автора """
+    if settings.RECIPE_FEED_CACHE_TIMEOUT:
+        reset_feed_heads(Subscription.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
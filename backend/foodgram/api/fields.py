@@ -0,0 +1,81 @@
+import binascii
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image
+from rest_framework import serializers
+
+from . import metrics
+
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class StreamingImageField(serializers.ImageField):
+    """ Изображение в base64 (data URI) или файлом в multipart.
+
+    base64 декодируется частями во временный файл (в памяти до
+    FILE_UPLOAD_MAX_MEMORY_SIZE, дальше на диске), размер файла и
+    число пикселей проверяются до полного декодирования картинки.
+    """
+    chunk_size = 64 * 1024
+    default_error_messages = {
+        'invalid_base64': 'Изображение должно быть строкой base64.',
+        'too_large': 'Размер изображения превышает {limit} байт.',
+        'too_many_pixels': 'Изображение больше {limit} пикселей.',
+        'invalid_format': 'Неподдерживаемый формат изображения.',
+    }
+
+    def to_internal_value(self, data):
+        if data in ('', None):
+            return None
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif getattr(data, 'size', 0) > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail('too_large', limit=settings.RECIPE_IMAGE_MAX_BYTES)
+        metrics.IMAGE_UPLOAD_BYTES.observe(data.size)
+        extension = self.check_image(data)
+        data.name = f'{uuid.uuid4()}.{extension}'
+        return super().to_internal_value(data)
+
+    def decode(self, data):
+        start = data.find(';base64,')
+        start = 0 if start == -1 else start + len(';base64,')
+        if any(char.isspace() for char in data[start:start + 1024]):
+            data, start = ''.join(data[start:].split()), 0
+        size = (len(data) - start) * 3 // 4
+        if size > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail('too_large', limit=settings.RECIPE_IMAGE_MAX_BYTES)
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile('image', None, size, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, 'image', None, size, None)
+        step = self.chunk_size * 4
+        try:
+            for position in range(start, len(data), step):
+                file.write(binascii.a2b_base64(data[position:position + step]))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def check_image(self, file):
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                image_format = image.format
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      limit=settings.RECIPE_IMAGE_MAX_PIXELS)
+        if image_format not in FORMATS:
+            self.fail('invalid_format')
+        return FORMATS[image_format]
@@ -1,18 +1,54 @@
 import django_filters as filter
+from django.conf import settings
+from django.core.cache import cache
 
-from recipes.models import Recipes, Tag
+from recipes.models import Recipes, RecipeTag, Tag
+from recipes.search import search_recipes
+from .caching import get_data_version
+
+
+def get_tag_ids(slugs=()):
+    """ Словарь slug -> id тегов, кешируется до изменения тегов.
+
+    Версия данных живёт в кеше своего процесса, и о теге, созданном
+    через другой воркер, словарь может не знать. Поэтому, если среди
+    slugs есть неизвестный, словарь перечитывается из базы.
+    """
+    key = f'tag-ids:{get_data_version("tags")}'
+    tag_ids = cache.get(key)
+    if tag_ids is None or not set(slugs) <= tag_ids.keys():
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, settings.REFERENCE_CACHE_TIMEOUT)
+    return tag_ids
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilter(filter.FilterSet):
     author = filter.CharFilter()
-    tags = filter.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filter.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags',
     )
     is_favorited = filter.NumberFilter(method='get_favorite')
     is_in_shopping_cart = filter.NumberFilter(
         method='get_is_in_shopping_cart')
+    search = filter.CharFilter(method='get_search')
+    ordering = filter.ChoiceFilter(
+        choices=(('popular', 'popular'),),
+        method='get_ordering',
+    )
+
+    # Порядок по популярности, совпадает с recipe_favorites_count_idx.
+    popular_ordering = ('-favorites_count', '-pub_date', '-id')
+
+    def __init__(self, data=None, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        # Выбор tags проверяется по словарю из get_tag_choices.
+        if hasattr(self.data, 'getlist') and 'tags' in self.data:
+            get_tag_ids(self.data.getlist('tags'))
 
     class Meta:
         model = Recipes
@@ -20,9 +56,23 @@ class RecipeFilter(filter.FilterSet):
             'author',
             'tags',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search',
+            'ordering',
         ]
 
+    def get_tags(self, queryset, name, value):
+        tag_ids = get_tag_ids()
+        return queryset.filter(id__in=RecipeTag.objects.filter(
+            tag_id__in=[tag_ids[slug] for slug in value]
+        ).values('recipe_id'))
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*self.popular_ordering)
+
     def get_favorite(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(favorite__user=self.request.user)
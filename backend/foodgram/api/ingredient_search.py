@@ -0,0 +1,79 @@
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models.functions import Lower
+
+from recipes.models import Ingredients
+
+
+class IngredientIndex:
+    """ Поиск ингредиентов в памяти по отсортированному массиву имён.
+
+    Совпадения по началу названия находятся бинарным поиском и идут
+    первыми, за ними совпадения по подстроке; регистр не учитывается.
+    """
+    def __init__(self, rows):
+        self.rows = sorted(
+            rows, key=lambda row: (row['name'].casefold(), row['id']))
+        self.folded = [row['name'].casefold() for row in self.rows]
+        self.built_at = time.monotonic()
+
+    def search(self, query, limit):
+        result = []
+        query = query.casefold()
+        position = bisect_left(self.folded, query)
+        while (len(result) < limit and position < len(self.folded)
+               and self.folded[position].startswith(query)):
+            result.append(self.rows[position])
+            position += 1
+        for row, name in zip(self.rows, self.folded):
+            if len(result) >= limit:
+                break
+            if query in name and not name.startswith(query):
+                result.append(row)
+        return result
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if (_index is None or time.monotonic() - _index.built_at
+            > settings.INGREDIENT_SEARCH_INDEX_TTL):
+        _index = IngredientIndex(
+            Ingredients.objects.values('id', 'name', 'measurement_unit'))
+    return _index
+
+
+def reset_index():
+    global _index
+    _index = None
+
+
+def search_in_db(query, limit):
+    # lower(name) LIKE 'запрос%' использует ingredient_name_lower_idx.
+    fields = ('id', 'name', 'measurement_unit')
+    query = query.lower()
+    ingredients = Ingredients.objects.annotate(name_lower=Lower('name'))
+    prefix = list(
+        ingredients.filter(name_lower__startswith=query)
+        .order_by('name_lower', 'id').values(*fields)[:limit]
+    )
+    if len(prefix) >= limit:
+        return prefix
+    substring = (
+        ingredients.filter(name_lower__contains=query)
+        .exclude(name_lower__startswith=query)
+        .order_by('name_lower', 'id').values(*fields)[:limit - len(prefix)]
+    )
+    return prefix + list(substring)
+
+
+def search_ingredients(query):
+    """ Автодополнение: сначала по началу названия, затем по подстроке """
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+    if settings.INGREDIENT_SEARCH_INDEX:
+        return get_index().search(query, limit)
+    return search_in_db(query, limit)
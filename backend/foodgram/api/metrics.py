@@ -0,0 +1,73 @@
+""" Метрики API в формате Prometheus.
+
+Под gunicorn с несколькими воркерами задайте PROMETHEUS_MULTIPROC_DIR:
+каждый процесс пишет значения в свои файлы в этой папке, а /api/metrics
+суммирует их по всем воркерам. Папку очищает gunicorn.conf.py при старте.
+
+Снаружи /api/metrics закрыт в nginx; при заданном METRICS_TOKEN
+запрос должен передать заголовок Authorization: Bearer <токен>.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Запросы к API',
+    ['view', 'method', 'status'])
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время ответа API',
+    ['view', 'method'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'SQL-запросов на один запрос к API',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+CACHE = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кешам API, result=hit|miss',
+    ['cache', 'result'])
+IMAGE_UPLOAD_BYTES = Histogram(
+    'foodgram_recipe_image_upload_bytes',
+    'Размер загружаемых изображений рецептов',
+    buckets=(16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 2 * 1024 ** 2,
+             5 * 1024 ** 2, 10 * 1024 ** 2, 20 * 1024 ** 2))
+
+
+def view_name(request):
+    """ Имя класса view (RecipeViewSet) или функции-view """
+    match = request.resolver_match
+    if match is None:
+        return 'none'
+    return getattr(match.func, 'cls', match.func).__name__
+
+
+def cache_result(cache, hit):
+    CACHE.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def metrics(request):
+    """ Экспозиция метрик в текстовом формате Prometheus """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
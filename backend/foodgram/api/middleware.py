@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCollector:
+    """ Обёртка execute_wrapper: число и время SQL-запросов по формам.
+
+    Формой считается текст SQL без параметров, поэтому одинаковые
+    запросы с разными id (признак N+1) попадают в одну группу. Формы
+    считаются только с track_shapes=True.
+    """
+
+    def __init__(self, track_shapes=False):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {} if track_shapes else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            if self.shapes is not None:
+                self.shapes[sql] = self.shapes.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        return sorted(
+            ((count, sql) for sql, count in self.shapes.items()
+             if count >= threshold),
+            reverse=True)
+
+    def collect(self):
+        """ Контекст, в котором учитываются запросы всех баз """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class QueryCollectingMiddleware:
+    """ Основа middleware, замеряющих время ответа и SQL-запросы.
+
+    finish() вызывается, когда ответ сформирован, report() — когда
+    отдано всё тело: у потоковых ответов БД читается уже после выхода
+    из view, и эти запросы тоже учитываются.
+    """
+    enabled_setting = None
+    track_query_shapes = False
+
+    def __init__(self, get_response):
+        if not getattr(settings, self.enabled_setting):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector(self.track_query_shapes)
+        start = time.perf_counter()
+        with collector.collect():
+            response = self.get_response(request)
+        self.finish(request, response, collector,
+                    time.perf_counter() - start)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content,
+                collector, start)
+        else:
+            self.report(request, response, collector,
+                        time.perf_counter() - start)
+        return response
+
+    def stream(self, request, response, content, collector, start):
+        with collector.collect():
+            yield from content
+        self.report(
+            request, response, collector, time.perf_counter() - start)
+
+    def finish(self, request, response, collector, elapsed):
+        pass
+
+    def report(self, request, response, collector, elapsed):
+        pass
+
+
+class QueryInstrumentationMiddleware(QueryCollectingMiddleware):
+    """ Число и время SQL-запросов и время ответа для каждого запроса.
+
+    Включается QUERY_INSTRUMENTATION=True, иначе Django убирает
+    middleware из цепочки при старте. Результат пишется в лог
+    api.middleware строкой JSON с именем URL (например,
+    api:recipes-list) и в заголовок Server-Timing. Формы запросов,
+    повторённые не меньше QUERY_INSTRUMENTATION_REPEAT_THRESHOLD раз,
+    попадают в лог с уровнем WARNING как возможный N+1.
+    """
+    enabled_setting = 'QUERY_INSTRUMENTATION'
+    track_query_shapes = True
+
+    def finish(self, request, response, collector, elapsed):
+        response['Server-Timing'] = (
+            f'db;dur={collector.duration * 1000:.1f};'
+            f'desc="{collector.count} queries", '
+            f'app;dur={elapsed * 1000:.1f}')
+
+    def report(self, request, response, collector, elapsed):
+        match = request.resolver_match
+        repeated = collector.repeated(
+            settings.QUERY_INSTRUMENTATION_REPEAT_THRESHOLD)
+        record = {
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 1),
+            'queries': collector.count,
+            'db_ms': round(collector.duration * 1000, 1),
+        }
+        if repeated:
+            record['repeated_queries'] = [
+                {'count': count, 'sql': sql} for count, sql in repeated]
+        logger.log(logging.WARNING if repeated else logging.INFO,
+                   json.dumps(record, ensure_ascii=False))
+
+
+class MetricsMiddleware(QueryCollectingMiddleware):
+    """ Метрики Prometheus: запросы, время ответа и SQL по view.
+
+    Включается METRICS_ENABLED, значения отдаёт /api/metrics.
+    """
+    enabled_setting = 'METRICS_ENABLED'
+
+    def report(self, request, response, collector, elapsed):
+        view = metrics.view_name(request)
+        metrics.REQUESTS.labels(
+            view, request.method, response.status_code).inc()
+        metrics.LATENCY.labels(view, request.method).observe(elapsed)
+        metrics.QUERIES.labels(view).observe(collector.count)
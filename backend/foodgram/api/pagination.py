@@ -1,7 +1,217 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import metrics
+
+
+class KeysetPagination(BasePagination):
+    """ Пагинация по курсору без OFFSET и COUNT.
+
+    Курсор хранит значения полей view.cursor_ordering у крайней записи
+    страницы, следующая страница выбирается условием
+    (pub_date, id) < (:pub_date, :id) по индексу.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.ordering = tuple(view.cursor_ordering)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position, ordering))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return size if size > 0 else self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.encode_link(None, reverse=False)
+        return self.encode_link(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_link(None, reverse=True)
+        return self.encode_link(self.get_position(self.page[0]), True)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def get_field(self, name):
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def get_position(self, obj):
+        return [
+            getattr(obj, self.get_field(field.lstrip('-')).attname)
+            for field in self.ordering
+        ]
+
+    def after(self, position, ordering):
+        conditions = []
+        for index, field in enumerate(ordering):
+            equal = {
+                previous.lstrip('-'): position[number]
+                for number, previous in enumerate(ordering[:index])
+            }
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal[f'{field.lstrip("-")}__{lookup}'] = position[index]
+            conditions.append(Q(**equal))
+        return reduce(or_, conditions)
+
+    def encode_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        # isoformat() сохраняет микросекунды, которые DjangoJSONEncoder
+        # отбрасывает, иначе записи с тем же pub_date теряются.
+        cursor = b64encode(json.dumps(
+            {'p': position, 'r': reverse},
+            default=lambda value: value.isoformat()
+        ).encode()).decode()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(b64decode(cursor.encode()).decode())
+            position = data['p']
+            if position is not None:
+                position = [
+                    self.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(self.ordering, position)
+                ]
+                if len(position) != len(self.ordering):
+                    raise ValueError
+            return position, bool(data['r'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+def estimate_count(queryset):
+    """ Оценка числа строк таблицы по статистике Postgres """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class ApproximateCountPaginator(Paginator):
+    """ Пагинатор с приблизительным подсчётом больших списков.
+
+    Для запросов без фильтров берётся оценка из pg_class, для остальных
+    точный COUNT(*), который кешируется на PAGINATION_COUNT_CACHE_TIMEOUT
+    секунд, если он не меньше PAGINATION_APPROXIMATE_COUNT_THRESHOLD.
+    Счётчики из оценки и из кеша считаются приблизительными.
+    """
+    is_approximate = False
+
+    @cached_property
+    def count(self):
+        threshold = settings.PAGINATION_APPROXIMATE_COUNT_THRESHOLD
+        queryset = self.object_list
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= threshold:
+            self.is_approximate = True
+            return estimate
+        key = 'count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is not None:
+            metrics.cache_result('pagination_count', True)
+            self.is_approximate = True
+            return count
+        count = queryset.count()
+        if count >= threshold:
+            metrics.cache_result('pagination_count', False)
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
-    """ Кастомный пагинатор """
+    """ Кастомный пагинатор.
+
+    По умолчанию постраничный, с признаком приблизительного count.
+    Если в запросе есть параметр cursor (для первой страницы — пустой),
+    а у view задан cursor_ordering, используется KeysetPagination.
+    """
     page_size_query_param = 'limit'
     page_size = 6
+    django_paginator_class = ApproximateCountPaginator
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (getattr(view, 'cursor_ordering', None)
+                and KeysetPagination.cursor_query_param
+                in request.query_params):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_approximate', self.page.paginator.is_approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
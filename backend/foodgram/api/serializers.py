@@ -1,11 +1,25 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import CustomUser, Subscription
+from recipes.images import normalize_image, schedule_renditions
 from recipes.models import (Recipes, Tag,
                             Ingredients, RecipeTag,
-                            RecipeIngredient, Favorite)
+                            RecipeIngredient, Favorite,
+                            ShoppingListItem)
+from .fields import StreamingImageField
+
+
+class RenditionField(serializers.ImageField):
+    """ URL копии изображения рецепта, пока её нет — оригинала """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance) or instance.image
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -35,14 +49,28 @@ class CustomUserSerializer(UserSerializer):
             'last_name',
             'is_subscribed'
         ]
+        # Как у djoser.serializers.UserSerializer: email — логин.
+        read_only_fields = ('email',)
+
+    def get_subscribed_ids(self, user):
+        """ Id авторов, на которых подписан пользователь.
+
+        Загружаются один раз и хранятся в общем контексте сериализации,
+        поэтому вложенные и списочные сериализаторы не делают запрос
+        на каждого пользователя.
+        """
+        if 'subscribed_ids' not in self.context:
+            self.context['subscribed_ids'] = set(
+                Subscription.objects.filter(user=user)
+                .values_list('author_id', flat=True)
+            )
+        return self.context['subscribed_ids']
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return obj.id in self.get_subscribed_ids(request.user)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -81,7 +109,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         method_name='get_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         read_only=True, method_name='get_is_in_shopping_cart')
-    image = Base64ImageField()
+    image = StreamingImageField()
+    image_card = RenditionField()
+    image_detail = RenditionField()
 
     class Meta:
         model = Recipes
@@ -94,15 +124,19 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_card',
+            'image_detail',
             'text',
             'cooking_time'
         ]
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
+        ingredients = obj.recipeingredient_set.all()
         return RecipeIngredientSerializers(ingredients, many=True).data
 
     def get_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -111,11 +145,25 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context['request'].user
         return user.is_authenticated and recipe.carts.filter(
             user=user).exists()
 
 
+class RecipeCoverageSerializer(RecipeSerializer):
+    """ Сериализатор Рецепта с долей имеющихся ингредиентов.
+
+    Описывает ответ /api/recipes/cook/, который собирает
+    recipes_to_list; совпадение проверяет api.tests.FastPathTests.
+    """
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['coverage']
+
+
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
     """ Сериализатор добавления Ингредиента"""
     id = serializers.IntegerField()
@@ -134,7 +182,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True
     )
-    image = Base64ImageField()
+    image = StreamingImageField()
 
     class Meta:
         model = Recipes
@@ -150,7 +198,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, data):
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError(
                 'Должен быть указан хотя бы один Ингредиент')
@@ -166,7 +214,14 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     'Рецепт не может иметь одинаковые Ингредиенты')
             list_ingredients.append(i['id'])
 
-        tags = self.initial_data.get('tags')
+        ingredient_ids = [i['id'] for i in data.get('ingredients', [])]
+        existing = Ingredients.objects.in_bulk(ingredient_ids)
+        missing = [pk for pk in ingredient_ids if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не существуют: {missing}')
+
+        tags = data.get('tags')
         if not tags:
             raise serializers.ValidationError(
                 'Должен быть указан хотя бы один Тег')
@@ -184,40 +239,82 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return data
 
     def create_tags(self, tags, recipe):
-        for tag in tags:
-            RecipeTag.objects.create(recipe=recipe, tag=tag)
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag) for tag in tags)
 
     def create_ingredients(self, ingredients, recipe):
-        for i in ingredients:
-            ingredient = Ingredients.objects.get(id=i['id'])
-            RecipeIngredient.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=i['amount'])
-
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=i['id'], amount=i['amount'])
+            for i in ingredients)
+
+    def update_tags(self, tags, recipe):
+        """ Перезаписывает только добавленные и удалённые теги """
+        old_ids = set(
+            RecipeTag.objects.filter(recipe=recipe)
+            .values_list('tag_id', flat=True))
+        new_ids = {tag.id for tag in tags}
+        if old_ids - new_ids:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=old_ids - new_ids).delete()
+        self.create_tags(
+            [tag for tag in tags if tag.id not in old_ids], recipe)
+
+    def update_ingredients(self, ingredients, recipe):
+        """ Перезаписывает только изменившиеся ингредиенты """
+        old = {
+            ri.ingredient_id: ri
+            for ri in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        new = {i['id']: i['amount'] for i in ingredients}
+        # Удаление учитывают сигналы, bulk_update и bulk_create — нет.
+        deltas = {pk: amount - old[pk].amount if pk in old else amount
+                  for pk, amount in new.items()}
+        removed = [ri.id for pk, ri in old.items() if pk not in new]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        changed = []
+        for pk, amount in new.items():
+            if pk in old and old[pk].amount != amount:
+                old[pk].amount = amount
+                changed.append(old[pk])
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [i for i in ingredients if i['id'] not in old], recipe)
+        ShoppingListItem.objects.update_recipe_amounts(recipe, deltas)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         author = self.context.get('request').user
+        validated_data['image'] = normalize_image(validated_data['image'])
         recipe = Recipes.objects.create(author=author, **validated_data)
         self.create_ingredients(ingredients, recipe)
         self.create_tags(tags, recipe)
+        schedule_renditions(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        RecipeIngredient.objects.filter(recipe=instance).delete()
         ingredients = validated_data.pop('ingredients')
-        self.create_ingredients(ingredients, instance)
-        RecipeTag.objects.filter(recipe=instance).delete()
+        self.update_ingredients(ingredients, instance)
         tags = validated_data.pop('tags')
-        self.create_tags(tags, instance)
+        self.update_tags(tags, instance)
         instance.name = validated_data.pop('name')
         instance.text = validated_data.pop('text')
         if validated_data.get('image'):
-            instance.image = validated_data.pop('image')
+            instance.image = normalize_image(validated_data.pop('image'))
+            instance.image_card = instance.image_detail = ''
+            schedule_renditions(instance)
         instance.cooking_time = validated_data.pop('cooking_time')
         instance.save()
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'recipeingredient_set__ingredient', 'tags')
         return RecipeSerializer(instance, context={
             'request': self.context.get('request')
         }).data
@@ -225,17 +322,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
 class ShowFavoriteSerializer(serializers.ModelSerializer):
     """ Сериализатор для отображения избранного. """
+    image_card = RenditionField()
 
     class Meta:
         model = Recipes
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_card', 'cooking_time']
 
 
 class ShowSubscribeSerializer(serializers.ModelSerializer):
     """ Сериализатор отображения подписки """
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
@@ -251,26 +348,23 @@ class ShowSubscribeSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=request.user, author=obj).exists()
+        # Сериализатор отдаёт только авторов из подписок пользователя.
+        return True
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipes = Recipes.objects.filter(author=obj)
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, 'recent_recipes'):
+            recipes = obj.recent_recipes
+        else:
+            recipes = Recipes.objects.filter(author=obj)
+            limit = request.query_params.get('recipes_limit')
+            if limit:
+                recipes = recipes[:int(limit)]
         return ShowFavoriteSerializer(
             recipes, many=True, context={'request': request}).data
 
-    def get_recipes_count(self, obj):
-        return Recipes.objects.filter(author=obj).count()
-
 
 class SubscribeSerializer(serializers.ModelSerializer):
     """ Сериализатор подписки """
@@ -298,9 +392,11 @@ class SubscribeSerializer(serializers.ModelSerializer):
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """ Сериализатор Корзины Покупок """
+    image_card = RenditionField()
+
     class Meta:
         model = Recipes
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_card', 'cooking_time']
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,52 @@
+import csv
+import json
+
+from recipes.models import ShoppingListItem
+
+
+def get_shopping_list(user):
+    """ Предрасчитанный список покупок пользователя """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values_list('ingredient__name',
+                     'ingredient__measurement_unit',
+                     'amount')
+        .order_by('ingredient__name')
+        .iterator()
+    )
+
+
+class Echo:
+    """ Буфер для csv.writer, который сразу отдаёт записанную строку """
+    def write(self, value):
+        return value
+
+
+def stream_txt(rows):
+    for name, unit, amount in rows:
+        yield f'{name}\n{amount} {unit}\n-------\n'
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'measurement_unit', 'amount'])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    yield '['
+    separator = ''
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+STREAMS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+}
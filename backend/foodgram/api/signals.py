@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.counters import COUNTERS, shift_counter
+from recipes.models import (Ingredients, RecipeIngredient, Recipes,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.search import (cancel_search_vector_update,
+                            schedule_search_vector_update,
+                            update_search_vector)
+from .caching import bump_data_version
+from .feed import reset_followers_feed_heads
+from .ingredient_search import reset_index
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def ingredients_changed(**kwargs):
+    reset_index()
+    bump_data_version('ingredients')
+    if kwargs.get('created') is False:
+        update_search_vector(
+            Recipes.objects.filter(ingredients=kwargs['instance']))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(**kwargs):
+    bump_data_version('tags')
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_text_changed(sender, instance, using, **kwargs):
+    # После коммита, чтобы учесть ингредиенты, записанные bulk_create.
+    schedule_search_vector_update(
+        instance.pk if sender is Recipes else instance.recipe_id, using)
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_deleted(instance, using, **kwargs):
+    # Ингредиенты удаляются раньше рецепта и успевают его запланировать.
+    cancel_search_vector_update(instance.pk, using)
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def recipe_published(instance, **kwargs):
+    if kwargs.get('created') is not False:
+        transaction.on_commit(
+            lambda: reset_followers_feed_heads(instance.author_id))
+
+
+def counted_changed(sender, instance, signal, created=None, **kwargs):
+    """ Поддерживает счётчики COUNTERS при создании и удалении строк,
+    в том числе из админки и при каскадном удалении.
+    """
+    if created is False:
+        return
+    delta = -1 if signal is post_delete else 1
+    for model, counter, counted, field in COUNTERS:
+        if counted is sender:
+            shift_counter(
+                model, counter, getattr(instance, f'{field}_id'), delta)
+
+
+for counted in {counted for _, _, counted, _ in COUNTERS}:
+    post_save.connect(counted_changed, sender=counted)
+    post_delete.connect(counted_changed, sender=counted)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def cart_changed(instance, created=None, **kwargs):
+    """ Переносит ингредиенты рецепта в список покупок или из него """
+    if created is False:
+        return
+    ShoppingListItem.objects.add_recipe(
+        [instance.user_id], instance.recipe_id,
+        sign=-1 if created is None else 1)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def recipe_ingredient_saving(instance, **kwargs):
+    # Прежние значения нужны, чтобы вычесть их из списков покупок.
+    instance.shopping_list_old = None if instance._state.adding else (
+        RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+            'recipe_id', 'ingredient_id', 'amount').first())
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, created=None, **kwargs):
+    """ Обновляет списки покупок у всех, у кого рецепт в корзине.
+
+    При каскадном удалении рецепта корзины и ингредиенты удаляются
+    в любом порядке, и оба сигнала читают текущее состояние базы,
+    поэтому количества вычитаются ровно один раз.
+    """
+    deltas = {}
+    if created is not None:
+        old, instance.shopping_list_old = instance.shopping_list_old, None
+        if old is not None:
+            recipe_id, ingredient_id, amount = old
+            deltas[recipe_id] = {ingredient_id: -amount}
+    changes = deltas.setdefault(instance.recipe_id, {})
+    changes[instance.ingredient_id] = changes.get(
+        instance.ingredient_id, 0) + (
+        -instance.amount if created is None else instance.amount)
+    for recipe_id, changes in deltas.items():
+        ShoppingListItem.objects.update_recipe_amounts(recipe_id, changes)
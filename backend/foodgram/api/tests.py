@@ -0,0 +1,689 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import FloatField, Value
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.fastpath import recipes_to_list
+from api.filters import RecipeFilter
+from api.ingredient_search import reset_index
+from api.middleware import MetricsMiddleware
+from api.renderers import FastJSONRenderer
+from api.serializers import (IngredientSerializer, RecipeCoverageSerializer,
+                             RecipeSerializer, TagSerializer)
+from api.views import RecipeViewSet
+from recipes.counters import reconcile_counters
+from recipes.models import (Favorite, Ingredients, RecipeIngredient,
+                            Recipes, RecipeTag, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.search import PendingSearchVectors, update_search_vector
+from users.models import CustomUser, Subscription
+
+
+class RecipeDataMixin:
+    """ Небольшой набор рецептов с тегами, избранным и корзинами """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Имя', last_name='Фамилия',
+                password='password-123')
+            for number in range(3)
+        ]
+        cls.user = cls.users[0]
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}',
+                               color=f'#00000{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ]
+        cls.recipes = []
+        for number in range(35):
+            recipe = Recipes.objects.create(
+                author=cls.users[number % 3],
+                name=f'рецепт {number}',
+                text=f'описание {number}',
+                image='recipes/images/test.jpg',
+                cooking_time=number + 1)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, amount=number + 1,
+                                 ingredient=cls.ingredients[
+                                     (number + shift) % 10])
+                for shift in range(3))
+            RecipeTag.objects.create(
+                recipe=recipe, tag=cls.tags[number % 3])
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::4]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::5]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+
+class RecipeListQueryCountTests(RecipeDataMixin, TestCase):
+    """ Число запросов списка рецептов не зависит от размера страницы """
+
+    def assert_queries(self, client, expected):
+        if connection.vendor == 'postgresql':
+            # Оценка числа строк из pg_class для count.
+            expected += 1
+        for limit in (1, 6, 30):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(expected):
+                    response = client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        # count, рецепты, ингредиенты, теги
+        self.assert_queries(self.anonymous, 4)
+
+    def test_authenticated(self):
+        # + токен и подписки для is_subscribed
+        self.assert_queries(self.client, 6)
+
+
+class IngredientSearchTests(TestCase):
+    """ Автодополнение ингредиентов по ?name= """
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredients.objects.bulk_create(
+            Ingredients(name=name, measurement_unit='г') for name in (
+                'барбарис молотый', 'виноградные листья молодые',
+                'молоко', 'Молоко топлёное', 'мёд',
+                'coconut milk', 'Milk', 'milk powder'))
+
+    def setUp(self):
+        cache.clear()
+        reset_index()
+
+    def search(self, name):
+        response = APIClient().get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data]
+
+    def test_prefix_ignores_case_and_goes_first(self):
+        expected = ['молоко', 'Молоко топлёное', 'барбарис молотый',
+                    'виноградные листья молодые']
+        self.assertEqual(self.search('Мол'), expected)
+        self.assertEqual(self.search('мол'), expected)
+
+    @override_settings(INGREDIENT_SEARCH_INDEX=False)
+    def test_database_search(self):
+        # lower() в SQLite меняет регистр только латиницы.
+        self.assertEqual(
+            self.search('MIL'), ['Milk', 'milk powder', 'coconut milk'])
+
+
+class ReferenceCacheTests(TestCase):
+    """ ETag и 304 для тегов и ингредиентов """
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast', color='#E26C2D')
+        cls.ingredient = Ingredients.objects.create(
+            name='соль', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_etag_does_not_depend_on_worker_cache(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        # Другой воркер: свой локальный кеш и своя версия данных.
+        cache.clear()
+        self.assertEqual(self.client.get('/api/tags/')['ETag'], etag)
+
+    def test_etag_changes_with_data(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        Tag.objects.create(name='Обед', slug='lunch', color='#49B64E')
+        self.assertNotEqual(self.client.get('/api/tags/')['ETag'], etag)
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/api/tags/', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_object_is_not_304(self):
+        response = self.client.get(
+            f'/api/ingredients/{self.ingredient.id + 1000}/',
+            HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            f'/api/ingredients/{self.ingredient.id}/',
+            HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 304)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'EXPLAIN проверяется только в Postgres')
+class RecipeListIndexTests(RecipeDataMixin, TestCase):
+    """ Запросы списка рецептов используют индексы.
+
+    На маленькой базе планировщик и так выбирает Seq Scan, поэтому
+    последовательное чтение запрещается: если в плане он всё равно
+    остался, подходящего индекса нет.
+    """
+
+    def get_plan(self, params):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.user
+        queryset = RecipeFilter(
+            QueryDict(params), request=request,
+            queryset=RecipeViewSet(request=request).get_queryset()
+        ).qs.order_by(*RecipeViewSet.cursor_ordering)[:6]
+        sql, sql_params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', sql_params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_no_sequential_scans(self):
+        for params in ('', f'author={self.users[1].id}',
+                       'tags=tag0&tags=tag1', 'is_favorited=1',
+                       'is_in_shopping_cart=1'):
+            with self.subTest(params=params):
+                self.assertNotIn('Seq Scan', self.get_plan(params))
+
+
+class RecipeSearchTests(TestCase):
+    """ Поиск рецептов по ?search= в названии, описании и ингредиентах.
+
+    Запросы в том же регистре, что и данные: LIKE в SQLite не учитывает
+    регистр только для латиницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password-123')
+        recipes = {
+            'Гороховый суп': ('варить час', ('горох', 'вода')),
+            'Салат': ('нарезать огурцы', ('огурец', 'укроп')),
+            'Омлет': ('взбить яйца', ('яйцо', 'молоко')),
+        }
+        for name, (text, ingredients) in recipes.items():
+            recipe = Recipes.objects.create(
+                author=author, name=name, text=text,
+                image='recipes/images/test.jpg', cooking_time=10)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, amount=1,
+                    ingredient=Ingredients.objects.get_or_create(
+                        name=ingredient, measurement_unit='г')[0])
+        # Сигналы пересчитывают вектор после коммита, а TestCase
+        # не коммитит транзакцию.
+        update_search_vector(Recipes.objects.all())
+
+    def search(self, text):
+        response = APIClient().get('/api/recipes/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return sorted(item['name'] for item in response.data['results'])
+
+    def assert_finds(self):
+        self.assertEqual(self.search('суп'), ['Гороховый суп'])
+        self.assertEqual(self.search('огурцы'), ['Салат'])
+        self.assertEqual(self.search('молоко'), ['Омлет'])
+        self.assertEqual(self.search('шоколад'), [])
+
+    def test_icontains_fallback(self):
+        with mock.patch('recipes.search.is_postgresql', return_value=False):
+            self.assert_finds()
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'Полнотекстовый поиск есть только в Postgres')
+    def test_full_text(self):
+        self.assert_finds()
+
+
+class CookTests(RecipeDataMixin, TestCase):
+    """ Подбор рецептов по имеющимся ингредиентам """
+
+    def cook(self, **params):
+        return self.anonymous.get('/api/recipes/cook/', {
+            'ingredients': [ingredient.id
+                            for ingredient in self.ingredients[:3]],
+            'limit': 30, **params})
+
+    def test_coverage(self):
+        response = self.cook(min_coverage=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(item['id'] for item in response.data['results']),
+            [self.recipes[number].id for number in (0, 10, 20, 30)])
+        self.assertEqual(
+            {item['coverage'] for item in response.data['results']}, {1.0})
+
+    def test_only_recipes_with_ingredients(self):
+        response = self.cook()
+        self.assertEqual(response.status_code, 200)
+        # Ингредиенты 0..2 есть в рецептах с номером n % 10 из 0, 1, 2, 8, 9.
+        self.assertEqual(len(response.data['results']), 18)
+
+    def test_invalid_min_coverage(self):
+        for value in ('nan', 'inf', '-0.1', '1.5', 'много'):
+            with self.subTest(min_coverage=value):
+                self.assertEqual(
+                    self.cook(min_coverage=value).status_code, 400)
+
+
+class CounterTests(RecipeDataMixin, TestCase):
+    """ Денормализованные счётчики ведутся сигналами и не уходят в минус """
+
+    def assert_counters_match(self):
+        self.assertEqual(
+            reconcile_counters(check=True),
+            {'favorites_count': 0, 'recipes_count': 0,
+             'subscribers_count': 0})
+
+    def test_counters_follow_orm_changes(self):
+        self.assert_counters_match()
+        recipe = self.recipes[1]
+        Favorite.objects.create(user=self.users[2], recipe=recipe)
+        Subscription.objects.create(user=self.users[2], author=self.user)
+        self.assert_counters_match()
+        # Каскадное удаление избранного вместе с рецептом.
+        recipe.delete()
+        self.users[2].delete()
+        self.assert_counters_match()
+
+    def test_api_changes(self):
+        recipe = self.recipes[1]
+        self.assertEqual(self.client.post(
+            f'/api/recipes/{recipe.id}/favorite/').status_code, 201)
+        self.assertEqual(self.client.post(
+            f'/api/users/{self.users[2].id}/subscribe/').status_code, 201)
+        self.assert_counters_match()
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{recipe.id}/favorite/').status_code, 204)
+        self.assertEqual(self.client.delete(
+            f'/api/users/{self.users[2].id}/subscribe/').status_code, 204)
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{self.recipes[0].id}/').status_code, 204)
+        self.assert_counters_match()
+
+    def test_drifted_counters_do_not_go_negative(self):
+        Recipes.objects.update(favorites_count=0)
+        CustomUser.objects.update(recipes_count=0, subscribers_count=0)
+        recipe = self.recipes[0]
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{recipe.id}/favorite/').status_code, 204)
+        self.assertEqual(self.client.delete(
+            f'/api/users/{self.users[1].id}/subscribe/').status_code, 204)
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{recipe.id}/').status_code, 204)
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.user.pk).recipes_count, 0)
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.users[1].pk).subscribers_count, 0)
+
+
+class FastPathTests(RecipeDataMixin, TestCase):
+    """ Ответы без сериализаторов совпадают с сериализаторами байт в байт """
+
+    def render_recipes(self, user, extra_fields=()):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        queryset = RecipeViewSet(request=request).get_queryset()
+        serializer_class = RecipeSerializer
+        if extra_fields:
+            queryset = queryset.annotate(
+                coverage=Value(0.5, output_field=FloatField()))
+            serializer_class = RecipeCoverageSerializer
+        recipes = list(queryset)
+        fast = FastJSONRenderer().render(
+            recipes_to_list(recipes, request, extra_fields))
+        reference = JSONRenderer().render(serializer_class(
+            recipes, many=True, context={'request': request}).data)
+        return fast, reference
+
+    def test_recipes(self):
+        recipe = self.recipes[0]
+        recipe.text = 'строка\u2028"кавычки" \\ 😀'
+        recipe.image_card = 'recipes/renditions/card.jpg'
+        recipe.save()
+        for user in (AnonymousUser(), self.user):
+            for extra_fields in ((), ('coverage',)):
+                with self.subTest(anonymous=user.is_anonymous,
+                                  extra_fields=extra_fields):
+                    fast, reference = self.render_recipes(
+                        user, extra_fields)
+                    self.assertEqual(fast, reference)
+        # Данные с избранным и подписками действительно проверены.
+        self.assertIn(b'"is_favorited":true', fast)
+        self.assertIn(b'"is_subscribed":true', fast)
+        self.assertIn(b'"slug":"tag0"', fast)
+        self.assertIn(b'"coverage":0.5', fast)
+
+    def test_tags(self):
+        response = self.anonymous.get('/api/tags/')
+        self.assertEqual(response.content, JSONRenderer().render(
+            TagSerializer(Tag.objects.all(), many=True).data))
+
+    def test_ingredients(self):
+        for params in ({}, {'name': 'ингредиент 1'}):
+            with self.subTest(params=params):
+                response = self.anonymous.get('/api/ingredients/', params)
+                ingredients = Ingredients.objects.in_bulk(
+                    [item['id'] for item in response.json()])
+                self.assertEqual(response.content, JSONRenderer().render(
+                    IngredientSerializer(
+                        [ingredients[item['id']] for item in response.json()],
+                        many=True).data))
+
+
+class MetricsTests(TestCase):
+    """ /api/metrics и middleware, собирающие SQL-запросы """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_disabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(
+                APIClient().get('/api/metrics').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(APIClient().get('/api/metrics').status_code, 403)
+        self.assertEqual(APIClient().get(
+            '/api/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+        ).status_code, 403)
+        response = APIClient().get(
+            '/api/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'foodgram_http_requests_total', response.content)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_query_shapes_not_tracked(self):
+        with mock.patch.object(
+                MetricsMiddleware, 'report', autospec=True) as report:
+            APIClient().get('/api/tags/')
+        collector = report.call_args[0][3]
+        self.assertGreater(collector.count, 0)
+        self.assertIsNone(collector.shapes)
+
+    @override_settings(QUERY_INSTRUMENTATION=True,
+                       QUERY_INSTRUMENTATION_REPEAT_THRESHOLD=1)
+    def test_query_instrumentation(self):
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            response = APIClient().get('/api/tags/')
+        self.assertIn('Server-Timing', response)
+        self.assertIn('repeated_queries', logs.output[0])
+
+
+class ShoppingListTests(RecipeDataMixin, TestCase):
+    """ Предрасчитанные списки покупок совпадают с корзинами """
+
+    def assert_in_sync(self):
+        call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+
+    def amount(self, user, ingredient):
+        item = ShoppingListItem.objects.filter(
+            user=user, ingredient=ingredient).first()
+        return item and item.amount
+
+    def test_api_cart_changes(self):
+        self.assert_in_sync()
+        self.assertEqual(self.client.post(
+            f'/api/recipes/{self.recipes[1].id}/shopping_cart/'
+        ).status_code, 201)
+        self.assert_in_sync()
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+        ).status_code, 204)
+        self.assert_in_sync()
+
+    def test_api_recipe_update_and_delete(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        image = BytesIO()
+        Image.new('RGB', (1, 1)).save(image, 'JPEG')
+        recipe = self.recipes[0]
+        ShoppingCart.objects.create(user=self.users[1], recipe=recipe)
+        data = {
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(
+                image.getvalue()).decode(),
+            'name': recipe.name, 'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [self.tags[0].id],
+            'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 100},
+                {'id': self.ingredients[5].id, 'amount': 7},
+            ],
+        }
+        with override_settings(MEDIA_ROOT=media_root,
+                               RECIPE_IMAGE_RENDITIONS_ASYNC=False):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_in_sync()
+        self.assertEqual(self.client.delete(
+            f'/api/recipes/{recipe.id}/').status_code, 204)
+        self.assert_in_sync()
+
+    def test_orm_changes(self):
+        item = RecipeIngredient.objects.filter(
+            recipe=self.recipes[5]).first()
+        before = self.amount(self.user, item.ingredient_id)
+        item.amount += 50
+        item.save()
+        self.assertEqual(
+            self.amount(self.user, item.ingredient_id), before + 50)
+        self.assert_in_sync()
+        item.ingredient = self.ingredients[9]
+        item.save()
+        self.assert_in_sync()
+        item.delete()
+        self.assert_in_sync()
+
+    def test_cascade_deletes(self):
+        ShoppingCart.objects.create(user=self.users[2], recipe=self.recipes[1])
+        # Копии из базы: delete() обнуляет pk у общих для тестов объектов.
+        # Рецепты автора уходят из чужих корзин вместе с аккаунтом.
+        CustomUser.objects.get(pk=self.users[1].pk).delete()
+        self.assert_in_sync()
+        CustomUser.objects.get(pk=self.user.pk).delete()
+        self.assert_in_sync()
+        Ingredients.objects.get(pk=self.ingredients[1].pk).delete()
+        self.assert_in_sync()
+
+    def test_rebuild_command(self):
+        ShoppingListItem.objects.filter(user=self.user).update(amount=1)
+        with self.assertRaises(CommandError):
+            self.assert_in_sync()
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assert_in_sync()
+
+
+class CurrentUserTests(RecipeDataMixin, TestCase):
+    """ /api/users/me/ """
+
+    def test_email_is_read_only(self):
+        response = self.client.patch(
+            '/api/users/me/', {'email': 'new@example.com',
+                               'first_name': 'Новое'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], self.user.email)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertEqual(user.first_name, 'Новое')
+
+
+class TagFilterTests(RecipeDataMixin, TestCase):
+    """ ?tags= видит теги, о которых кеш этого процесса не знает """
+
+    def test_tag_created_elsewhere(self):
+        self.assertEqual(self.anonymous.get(
+            '/api/recipes/', {'tags': 'tag0'}).status_code, 200)
+        # bulk_create не шлёт сигналов: как тег из другого воркера.
+        Tag.objects.bulk_create([
+            Tag(name='Новый', slug='new', color='#000009')])
+        tag = Tag.objects.get(slug='new')
+        RecipeTag.objects.create(recipe=self.recipes[0], tag=tag)
+        response = self.anonymous.get('/api/recipes/', {'tags': 'new'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.recipes[0].id])
+        self.assertEqual(self.anonymous.get(
+            '/api/recipes/', {'tags': 'missing'}).status_code, 400)
+
+
+class SearchVectorSignalTests(RecipeDataMixin, TestCase):
+    """ Один отложенный пересчёт поискового вектора на транзакцию """
+
+    def pending(self):
+        return [entry[1] for entry in connection.run_on_commit
+                if isinstance(entry[1], PendingSearchVectors)]
+
+    def test_one_callback_per_transaction(self):
+        with transaction.atomic():
+            recipe = Recipes.objects.get(pk=self.recipes[0].pk)
+            for item in RecipeIngredient.objects.filter(recipe=recipe):
+                item.delete()
+            recipe.save()
+            Recipes.objects.get(pk=self.recipes[1].pk).save()
+            # TestCase не коммитит, и в очереди остаются рецепты
+            # из setUpTestData — они в том же отложенном пересчёте.
+            pending = self.pending()
+            self.assertEqual(len(pending), 1)
+            self.assertLessEqual(
+                {self.recipes[0].pk, self.recipes[1].pk},
+                pending[0].recipe_ids)
+            # Удалённый рецепт не пересчитывается.
+            recipe.delete()
+            self.assertNotIn(self.recipes[0].pk, pending[0].recipe_ids)
+            self.assertIn(self.recipes[1].pk, pending[0].recipe_ids)
+
+
+class CursorMixin(RecipeDataMixin):
+    """ Обход страниц по ссылкам курсора """
+
+    def setUp(self):
+        super().setUp()
+        # Одинаковые pub_date проверяют сравнение по id внутри курсора.
+        Recipes.objects.filter(pk__in=[
+            recipe.pk for recipe in self.recipes[10:20]
+        ]).update(pub_date=self.recipes[10].pub_date)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def walk(self, response, direction):
+        """ Страницы по ссылкам next или previous, начиная с response """
+        pages = [self.ids(response)]
+        while response.data[direction] is not None:
+            response = self.client.get(response.data[direction])
+            pages.append(self.ids(response))
+        return pages, response
+
+
+class KeysetPaginationTests(CursorMixin, TestCase):
+    """ ?cursor= у списка рецептов """
+
+    def test_round_trip(self):
+        for params, ordering in (
+                ({}, RecipeViewSet.cursor_ordering),
+                ({'ordering': 'popular'}, RecipeFilter.popular_ordering)):
+            with self.subTest(**params):
+                expected = list(Recipes.objects.order_by(
+                    *ordering).values_list('id', flat=True))
+                forward, last = self.walk(self.client.get(
+                    '/api/recipes/', {'cursor': '', 'limit': 4, **params}),
+                    'next')
+                self.assertEqual(sum(forward, []), expected)
+                self.assertEqual(len(forward), 9)
+                backward, first = self.walk(last, 'previous')
+                self.assertEqual(backward[::-1], forward)
+                self.assertIsNone(first.data['previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('не-курсор', 'eyJwIjogWzFdLCAiciI6IGZhbHNlfQ=='):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(
+                    '/api/recipes/', {'cursor': cursor}).status_code, 404)
+
+
+class FeedTests(CursorMixin, TestCase):
+    """ Лента подписок и закешированное начало ленты """
+
+    def test_feed_head(self):
+        expected = list(Recipes.objects.filter(
+            author=self.users[1]
+        ).order_by(*RecipeViewSet.cursor_ordering).values_list(
+            'id', flat=True))
+        for head_size in (5, 60):
+            for limit in (3, 5, 8):
+                with self.subTest(head_size=head_size, limit=limit):
+                    self.assert_feed_head(head_size, limit, expected)
+
+    def assert_feed_head(self, head_size, limit, expected):
+        cache.clear()
+        with override_settings(RECIPE_FEED_HEAD_SIZE=head_size,
+                               RECIPE_FEED_CACHE_TIMEOUT=0):
+            uncached = self.client.get('/api/recipes/feed/', {'limit': limit})
+        self.assertEqual(self.ids(uncached), expected[:limit])
+        # Первый запрос кладёт начало ленты в кеш, второй берёт страницу
+        # по нему.
+        with override_settings(RECIPE_FEED_HEAD_SIZE=head_size):
+            for _ in range(2):
+                cached = self.client.get(
+                    '/api/recipes/feed/', {'limit': limit})
+                self.assertEqual(self.ids(cached), expected[:limit])
+                self.assertEqual(cached.data['next'], uncached.data['next'])
+        pages, _ = self.walk(cached, 'next')
+        self.assertEqual(sum(pages, []), expected)
+
+
+class SubscriptionsTests(RecipeDataMixin, TestCase):
+    """ /api/users/subscriptions/ """
+
+    def test_recipes_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['recipes']), 2)
+        for limit in ('x', '-1', '1.5'):
+            with self.subTest(recipes_limit=limit):
+                self.assertEqual(self.client.get(
+                    '/api/users/subscriptions/', {'recipes_limit': limit}
+                ).status_code, 400)
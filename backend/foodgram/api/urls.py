@@ -5,6 +5,7 @@ from .views import (TagViewSet, IngredientViewSet,
                     RecipeViewSet, SubscribeView,
                     ShowSubscribeView, ShoppingCartViewSet,
                     download_shopping_cart, FavoriteView,)
+from .metrics import metrics
 
 app_name = 'api'
 
@@ -34,6 +35,7 @@ urlpatterns = [
         'users/subscriptions/',
         ShowSubscribeView.as_view(),
         name='subscriptions'),
+    path('metrics', metrics, name='metrics'),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
     path('', include(router.urls)),
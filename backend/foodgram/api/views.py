@@ -4,16 +4,29 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Sum
-from rest_framework.decorators import api_view
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.db.models import (BooleanField, Count, Exists, FloatField,
+                              OuterRef, Prefetch, Q, Subquery, Value)
+from django.db.models.functions import Cast, NullIf
+from rest_framework.decorators import action, api_view, renderer_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from django_filters.rest_framework import DjangoFilterBackend
 
 from users.models import Subscription, CustomUser
 from .permissions import IsAuthorOrAdminOrReadOnly
-from .pagination import CustomPagination
+from .pagination import CustomPagination, KeysetPagination
+from .caching import ReferenceCacheMixin
+from .fastpath import (INGREDIENT_FIELDS, TAG_FIELDS,
+                       recipes_to_list)
+from .feed import followed_authors, get_feed_head, reset_feed_heads
 from .filters import RecipeFilter
+from .ingredient_search import search_ingredients
+from .renderers import CSVRenderer, PlainTextRenderer
+from .shopping_list import STREAMS, get_shopping_list
 from recipes.models import (Ingredients, Recipes,
                             RecipeIngredient, Tag,
                             Favorite, ShoppingCart)
@@ -23,8 +36,9 @@ from .serializers import (RecipeSerializer, RecipeCreateSerializer,
                           ShoppingCartSerializer, FavoriteSerializer)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ Отображение Ингредиентов """
+    cache_scope = 'ingredients'
     queryset = Ingredients.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -32,28 +46,141 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return self.cached_response(request, lambda: Response(list(
+                self.filter_queryset(self.get_queryset())
+                .values(*INGREDIENT_FIELDS))))
+        return self.cached_response(
+            request, lambda: Response(search_ingredients(name)))
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ Отображение Тегов"""
+    cache_scope = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: Response(list(
+            self.get_queryset().values(*TAG_FIELDS))))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """ Отображение Рецептов"""
-    queryset = Recipes.objects.all()
+    queryset = Recipes.objects.select_related('author').defer(
+        'search_vector'
+    ).prefetch_related(
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+        'tags',
+    )
     permission_classes = [IsAuthorOrAdminOrReadOnly]
     pagination_class = CustomPagination
+    cursor_ordering = ('-pub_date', '-id')
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.query_params.get('ordering') == 'popular':
+            self.cursor_ordering = RecipeFilter.popular_ordering
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return self.queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=BooleanField()),
+            )
+        return self.queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(recipes_to_list(page, request))
+
+    @action(detail=False, permission_classes=(AllowAny,))
+    def cook(self, request):
+        """ Рецепты из имеющихся ингредиентов.
+
+        ?ingredients=<id>&ingredients=<id>... — что есть у пользователя,
+        ?min_coverage=0..1 — минимальная доля ингредиентов рецепта из них.
+        Рецепты отсортированы по доле покрытых ингредиентов, фильтры
+        RecipeFilter (теги и др.) тоже применяются.
+        """
+        try:
+            ingredient_ids = [
+                int(pk) for pk in request.query_params.getlist('ingredients')]
+            min_coverage = float(
+                request.query_params.get('min_coverage', 0))
+            # Сравнение с nan ложно, поэтому nan тоже не пройдёт проверку.
+            if not 0 <= min_coverage <= 1:
+                raise ValueError
+        except ValueError:
+            raise ValidationError(
+                'ingredients — список id, min_coverage — число от 0 до 1')
+        if not ingredient_ids:
+            raise ValidationError('Укажите хотя бы один ингредиент')
+        # Агрегируем только рецепты, где есть хотя бы один из ингредиентов.
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            id__in=RecipeIngredient.objects.filter(
+                ingredient_id__in=ingredient_ids).values('recipe_id')
+        ).annotate(
+            total=Count('recipeingredient', distinct=True),
+            matched=Count(
+                'recipeingredient', distinct=True,
+                filter=Q(recipeingredient__ingredient_id__in=ingredient_ids)),
+        ).annotate(
+            coverage=Cast('matched', FloatField()) / NullIf(
+                Cast('total', FloatField()), Value(0.0)),
+        ).filter(
+            matched__gt=0, coverage__gte=min_coverage
+        ).order_by('-coverage', '-matched', '-pub_date', '-id')
+        # Порядок задаётся покрытием, курсорная пагинация неприменима.
+        self.cursor_ordering = None
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            recipes_to_list(page, request, extra_fields=('coverage',)))
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """ Лента рецептов авторов из подписок пользователя.
+
+        Всегда с пагинацией по курсору. Первая страница без фильтров
+        берётся по закешированным id начала ленты.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author_id__in=followed_authors(request.user))
+        paginator = KeysetPagination()
+        if not set(request.query_params) - {'limit', 'cursor'} and not (
+                request.query_params.get('cursor')):
+            head = get_feed_head(request.user, self.cursor_ordering)
+            size = paginator.get_page_size(request)
+            if head is not None and (
+                    len(head) > size
+                    or len(head) < settings.RECIPE_FEED_HEAD_SIZE):
+                queryset = queryset.filter(pk__in=head[:size + 1])
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            recipes_to_list(page, request))
+
 
 class SubscribeView(APIView):
     """ Подписка/Отписка """
@@ -61,33 +188,33 @@ class SubscribeView(APIView):
 
     def post(self, request, id):
         author = get_object_or_404(CustomUser, id=id)
+        if author == request.user:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                subscription = Subscription.objects.create(
+                    user=request.user, author=author)
+                transaction.on_commit(
+                    lambda: reset_feed_heads([request.user.id]))
+        except IntegrityError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
         serializer = SubscribeSerializer(
-            data={'user': request.user.id, 'author': id},
-            context={'request': request}
-        )
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            if not author:
-                return Response({'Такого автора не существует'},
-                                status=status.HTTP_404_NOT_FOUND)
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+            subscription, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        author = get_object_or_404(CustomUser, id=id)
-        if not Subscription.objects.filter(
-                user=request.user,
-                author=author
-        ).exists():
+        with transaction.atomic():
+            deleted, _ = Subscription.objects.filter(
+                user=request.user, author_id=id).delete()
+            if deleted:
+                transaction.on_commit(
+                    lambda: reset_feed_heads([request.user.id]))
+        if not deleted:
+            get_object_or_404(CustomUser, id=id)
             return Response(
                 {'Вы не подписаны на этого автора'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Subscription.objects.get(
-            user=request.user.id,
-            author=id
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -95,9 +222,28 @@ class ShowSubscribeView(ListAPIView):
     """ Отображение подписок"""
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
 
     def get(self, request):
-        queryset = CustomUser.objects.filter(subscribing__user=request.user)
+        recipes = Recipes.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit:
+            try:
+                limit = int(limit)
+                if limit < 0:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError(
+                    'recipes_limit — неотрицательное целое число')
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipes.objects.filter(author=OuterRef('author'))
+                .values('pk')[:limit]
+            ))
+        queryset = CustomUser.objects.filter(
+            subscribing__user=request.user
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recent_recipes')
+        )
         page = self.paginate_queryset(queryset)
         serializer = ShowSubscribeSerializer(
             page, many=True, context={'request': request})
@@ -109,33 +255,27 @@ class ShoppingCartViewSet(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, id):
-        recipe = get_object_or_404(Recipes, id=id)
-        if ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).exists():
+        recipe = get_object_or_404(Recipes.objects.only(
+            'id', 'name', 'image', 'image_card', 'cooking_time'), id=id)
+        try:
+            with transaction.atomic():
+                ShoppingCart.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
             return Response(
                 {f'Рецепт "{recipe.name}" уже в списке покупок'},
                 status=status.HTTP_400_BAD_REQUEST)
-
         serializer = ShoppingCartSerializer(recipe)
-        ShoppingCart.objects.create(user=request.user, recipe=recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        recipe = get_object_or_404(Recipes, id=id)
-        if not ShoppingCart.objects.filter(
-                user=request.user,
-                recipe=recipe.id
-        ).exists():
+        deleted, _ = ShoppingCart.objects.filter(
+            user=request.user, recipe_id=id).delete()
+        if not deleted:
+            get_object_or_404(Recipes, id=id)
             return Response(
                 {'Рецепт не был добавлен в корзину'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ShoppingCart.objects.get(
-            user=request.user.id,
-            recipe=recipe.id
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -145,60 +285,47 @@ class FavoriteView(APIView):
     pagination_class = CustomPagination
 
     def post(self, request, id):
-        serializer = FavoriteSerializer(
-            data={'user': request.user.id, 'recipe': id},
-            context={'request': request}
-        )
-        if Favorite.objects.filter(
-            recipe_id=id,
-            user_id=request.user.id
-        ).exists():
+        try:
+            with transaction.atomic():
+                favorite = Favorite.objects.create(
+                    user=request.user, recipe_id=id)
+        except IntegrityError:
+            if not Recipes.objects.filter(id=id).exists():
+                return Response(
+                    {'Такого рецепта не существует'},
+                    status=status.HTTP_400_BAD_REQUEST)
             return Response(
                 {'Рецепт уже в избранном'},
                 status=status.HTTP_400_BAD_REQUEST)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        if not Favorite.objects.filter(
-            recipe_id=id,
-            user_id=request.user.id
-        ).exists():
-            return Response(
-                {'Такого рецепта не существует'},
-                status=status.HTTP_400_BAD_REQUEST)
+        serializer = FavoriteSerializer(favorite)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        recipe = get_object_or_404(Recipes, id=id)
-        if not Favorite.objects.filter(
-                user=request.user.id,
-                recipe=recipe.id
-        ).exists():
+        deleted, _ = Favorite.objects.filter(
+            user=request.user, recipe_id=id).delete()
+        if not deleted:
+            get_object_or_404(Recipes, id=id)
             return Response(
                 {'Рецепт не был добавлен в избранное'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Favorite.objects.get(
-            user=request.user.id,
-            recipe=recipe.id
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(['GET'])
+@renderer_classes([PlainTextRenderer, CSVRenderer, JSONRenderer])
 def download_shopping_cart(request):
-    """ Метод для скачивания списка покупок """
-    shopping_list = []
-    for obj in (RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user)
-            .values('ingredient').annotate(Sum('amount'))
-            .values_list('ingredient__name',
-                         'ingredient__measurement_unit',
-                         'amount__sum')):
-        shopping_list.append(f'{obj[0]}\n{obj[2]} {obj[1]}\n-------\n')
-
-    headers = {
-        "Content-Type": "text/plain",
-        "Content-Disposition": 'attachment; filename="shopping_cart_list.txt"'
-    }
-    return HttpResponse(shopping_list, headers)
+    """ Метод для скачивания списка покупок.
+
+    Формат выбирается параметром ?format=txt|csv|json или заголовком
+    Accept, по умолчанию txt. Список отдаётся потоком, не собираясь
+    целиком в памяти.
+    """
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        STREAMS[renderer.format](get_shopping_list(request.user)),
+        content_type=f'{renderer.media_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart_list.{renderer.format}"')
+    return response
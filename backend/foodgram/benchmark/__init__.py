@@ -0,0 +1,12 @@
+""" Нагрузочный тест API.
+
+Заполняет отдельную тестовую базу синтетическими данными и прогоняет
+основные запросы через тестовый клиент Django, замеряя задержки,
+пропускную способность и число SQL-запросов. Запуск из backend/foodgram:
+
+    python -m benchmark --output bench.json
+    python -m benchmark --compare bench.json
+
+Используется база из настроек (DB_ENGINE и др.), но данные пишутся в
+тестовую базу test_<имя>, которая удаляется после прогона.
+"""
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import django
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmark',
+        description='Нагрузочный тест API на синтетических данных')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes-per-user', type=int, default=10)
+    parser.add_argument('--tags', type=int, default=8)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--carts-per-user', type=int, default=5)
+    parser.add_argument('--subscriptions-per-user', type=int, default=10)
+    parser.add_argument('--ingredients-path', default='data/ingredients.csv')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Замеряемых запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='Прогревочных запросов на сценарий')
+    parser.add_argument('--scenario', action='append',
+                        help='Запустить только эти сценарии')
+    parser.add_argument('--serialization-rows', type=int, default=100,
+                        help='Рецептов в замере строк/с сериализации, '
+                             '0 — не замерять')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--compare',
+                        help='JSON прошлого прогона для сравнения')
+    parser.add_argument('--keepdb', action='store_true',
+                        help='Не удалять тестовую базу после прогона')
+    return parser.parse_args()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    from .runner import compare, load, run, run_serialization
+    from .scenarios import SCENARIOS
+    from .seed import seed
+
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not args.scenario or scenario.name in args.scenario]
+    setup_test_environment()
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-bench-')
+    # Копии изображений строятся синхронно, чтобы фоновые потоки не
+    # обращались к тестовой базе во время замеров.
+    settings.RECIPE_IMAGE_RENDITIONS_ASYNC = False
+    database = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        users = seed(
+            users=args.users,
+            recipes_per_user=args.recipes_per_user,
+            tags=args.tags,
+            ingredients_per_recipe=args.ingredients_per_recipe,
+            favorites_per_user=args.favorites_per_user,
+            carts_per_user=args.carts_per_user,
+            subscriptions_per_user=args.subscriptions_per_user,
+            ingredients_path=args.ingredients_path,
+            random_seed=args.seed,
+        )
+        results = run(scenarios, users, requests=args.requests,
+                      warmup=args.warmup, random_seed=args.seed)
+        serialization = run_serialization(
+            users[0], rows=args.serialization_rows
+        ) if args.serialization_rows else {}
+    finally:
+        connection.creation.destroy_test_db(
+            database, verbosity=0, keepdb=args.keepdb)
+        teardown_test_environment()
+
+    report = {
+        'revision': git_revision(),
+        'database': connection.vendor,
+        'config': {
+            key: value for key, value in vars(args).items()
+            if key not in ('output', 'compare', 'keepdb')
+        },
+        'results': results,
+        'serialization': serialization,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            file.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+    if args.compare:
+        sys.stderr.write(compare(load(args.compare), report) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import json
+import math
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.fastpath import recipes_to_list
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.models import Ingredients, Recipes, Tag
+
+
+def percentile(values, percent):
+    """ Процентиль методом ближайшего ранга """
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def make_context():
+    return {
+        'recipes': list(Recipes.objects.values_list('id', flat=True)),
+        'ingredients': list(
+            Ingredients.objects.values_list('id', flat=True)),
+        'ingredient_names': list(
+            Ingredients.objects.values_list('name', flat=True)),
+        'tags': list(Tag.objects.values_list('slug', flat=True)),
+        'tag_ids': list(Tag.objects.values_list('id', flat=True)),
+    }
+
+
+def run_scenario(scenario, users, context, requests, warmup, random_seed):
+    """ Прогон сценария: задержки в мс, запросы к БД, коды ответов """
+    rnd = random.Random(random_seed)
+    clients = {}
+    latencies, queries, statuses = [], [], {}
+    started = None
+    for number in range(warmup + requests):
+        if number == warmup:
+            started = time.perf_counter()
+        user = None if scenario.anonymous else rnd.choice(users)
+        client = clients.get(user)
+        if client is None:
+            client = clients[user] = Client(
+                HTTP_AUTHORIZATION=f'Token {user.auth_token.key}'
+                if user else '')
+        method, path, data = scenario.request(rnd, context)
+        kwargs = {'content_type': 'application/json'} if data else {}
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = getattr(client, method)(path, data, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - begin
+        if number < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        code = str(response.status_code)
+        statuses[code] = statuses.get(code, 0) + 1
+    total = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'statuses': statuses,
+        'throughput_rps': round(requests / total, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+        },
+        'queries': {
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+
+def run(scenarios, users, requests=200, warmup=20, random_seed=0):
+    cache.clear()
+    context = make_context()
+    return {
+        scenario.name: run_scenario(
+            scenario, users, context, requests, warmup, random_seed)
+        for scenario in scenarios
+    }
+
+
+def run_serialization(user, rows=100, seconds=2.0):
+    """ Строк в секунду при сборке JSON списка рецептов: RecipeSerializer
+    с JSONRenderer против recipes_to_list с FastJSONRenderer.
+    """
+    request = Request(RequestFactory().get('/api/recipes/'))
+    request.user = user
+    recipes = list(RecipeViewSet(request=request).get_queryset()[:rows])
+    renderers = {
+        'serializer': lambda: JSONRenderer().render(RecipeSerializer(
+            recipes, many=True, context={'request': request}).data),
+        'fastpath': lambda: FastJSONRenderer().render(
+            recipes_to_list(recipes, request)),
+    }
+    results = {}
+    for name, render in renderers.items():
+        render()
+        rounds = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            render()
+            rounds += 1
+        results[name] = {'rows_per_sec': round(
+            rounds * len(recipes) / (time.perf_counter() - started))}
+    return results
+
+
+def compare(old, new):
+    """ Строки сравнения p50/p95 и числа запросов двух прогонов """
+    lines = [f'{"scenario":28} {"p50 ms":>16} {"p95 ms":>16} '
+             f'{"queries":>12}']
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            continue
+
+        def pair(section, key):
+            return (f'{before[section][key]:>7}'
+                    f'->{result[section][key]:<7}')
+        lines.append(f'{name:28} {pair("latency_ms", "p50"):>16} '
+                     f'{pair("latency_ms", "p95"):>16} '
+                     f'{pair("queries", "mean"):>12}')
+    for name, result in new.get('serialization', {}).items():
+        before = old.get('serialization', {}).get(name)
+        if before is not None:
+            lines.append(f'serialization {name:14} rows/s '
+                         f'{before["rows_per_sec"]}->{result["rows_per_sec"]}')
+    return '\n'.join(lines)
+
+
+def load(path):
+    with open(path, encoding='utf8') as file:
+        return json.load(file)
@@ -0,0 +1,83 @@
+import base64
+
+from .seed import make_image
+
+IMAGE = 'data:image/jpeg;base64,' + base64.b64encode(make_image()).decode()
+
+
+class Scenario:
+    """ Запрос к API, повторяемый при прогоне.
+
+    request(rnd, context) возвращает (method, path, data); context
+    содержит id рецептов, ингредиентов, тегов и авторов из базы.
+    """
+
+    def __init__(self, name, request, anonymous=False):
+        self.name = name
+        self.request = request
+        self.anonymous = anonymous
+
+
+def get(path):
+    return lambda rnd, context: ('get', path, None)
+
+
+def recipe_detail(rnd, context):
+    return 'get', f'/api/recipes/{rnd.choice(context["recipes"])}/', None
+
+
+def recipes_by_tags(rnd, context):
+    tags = rnd.sample(context['tags'], min(2, len(context['tags'])))
+    return 'get', '/api/recipes/?' + '&'.join(
+        f'tags={slug}' for slug in tags), None
+
+
+def recipes_search(rnd, context):
+    word = rnd.choice(context['ingredient_names']).split()[0]
+    return 'get', f'/api/recipes/?search={word}', None
+
+
+def ingredient_search(rnd, context):
+    name = rnd.choice(context['ingredient_names'])
+    return 'get', f'/api/ingredients/?name={name[:rnd.randint(1, 4)]}', None
+
+
+def recipes_cook(rnd, context):
+    ingredients = rnd.sample(context['ingredients'], 10)
+    return 'get', '/api/recipes/cook/?' + '&'.join(
+        f'ingredients={pk}' for pk in ingredients), None
+
+
+def recipe_create(rnd, context):
+    return 'post', '/api/recipes/', {
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': rnd.randint(5, 120),
+        'image': IMAGE,
+        'tags': rnd.sample(context['tag_ids'], 1),
+        'ingredients': [
+            {'id': pk, 'amount': rnd.randint(1, 500)}
+            for pk in rnd.sample(context['ingredients'], 5)
+        ],
+    }
+
+
+SCENARIOS = (
+    Scenario('recipes_list', get('/api/recipes/')),
+    Scenario('recipes_list_anonymous', get('/api/recipes/'), anonymous=True),
+    Scenario('recipes_list_tags', recipes_by_tags),
+    Scenario('recipes_list_favorited', get('/api/recipes/?is_favorited=1')),
+    Scenario('recipes_list_popular', get('/api/recipes/?ordering=popular')),
+    Scenario('recipes_list_cursor', get('/api/recipes/?cursor=')),
+    Scenario('recipes_search', recipes_search),
+    Scenario('recipes_feed', get('/api/recipes/feed/')),
+    Scenario('recipes_cook', recipes_cook),
+    Scenario('recipe_detail', recipe_detail),
+    Scenario('ingredient_search', ingredient_search, anonymous=True),
+    Scenario('tags', get('/api/tags/'), anonymous=True),
+    Scenario('subscriptions',
+             get('/api/users/subscriptions/?recipes_limit=3')),
+    Scenario('download_shopping_cart',
+             get('/api/recipes/download_shopping_cart/')),
+    Scenario('recipe_create', recipe_create),
+)
@@ -0,0 +1,102 @@
+import random
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import reconcile_counters
+from recipes.models import (Favorite, Ingredients, RecipeIngredient,
+                            Recipes, RecipeTag, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.search import update_search_vector
+from users.models import Subscription
+
+User = get_user_model()
+
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F9A62B', '#2D9CDB',
+              '#EB5757', '#6FCF97', '#BB6BD9')
+WORDS = ('суп', 'салат', 'паста', 'пирог', 'омлет', 'рагу', 'каша',
+         'запеканка', 'котлеты', 'блины', 'плов', 'борщ', 'соус', 'торт')
+
+
+def make_image():
+    """ Небольшая JPEG-картинка, общая для всех рецептов """
+    buffer = BytesIO()
+    Image.new('RGB', (640, 480), (200, 120, 60)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def seed(users=200, recipes_per_user=10, tags=8, ingredients_per_recipe=8,
+         favorites_per_user=20, carts_per_user=5, subscriptions_per_user=10,
+         ingredients_path='data/ingredients.csv', random_seed=0):
+    """ Заполняет базу и возвращает пользователей с токенами.
+
+    Количество связей задаётся на пользователя или рецепт, отклонение
+    случайное в пределах ±50%, генератор фиксирован random_seed, поэтому
+    повторный прогон даёт тот же набор данных.
+    """
+    rnd = random.Random(random_seed)
+    spread = (lambda mean: rnd.randint(mean // 2, mean + mean // 2))
+    call_command('load_ingredients_data', path=ingredients_path,
+                 stdout=StringIO())
+    ingredient_ids = list(Ingredients.objects.values_list('id', flat=True))
+
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', slug=f'tag{number}',
+            color=TAG_COLORS[number % len(TAG_COLORS)]
+            if number < len(TAG_COLORS) else f'#{number:06X}')
+        for number in range(tags))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    User.objects.bulk_create(
+        User(email=f'bench{number}@example.com', username=f'bench{number}',
+             first_name='Bench', last_name=str(number),
+             password='!')
+        for number in range(users))
+    user_list = list(User.objects.filter(email__startswith='bench'))
+    Token.objects.bulk_create(
+        Token(user=user, key=Token.generate_key()) for user in user_list)
+
+    image = default_storage.save(
+        'recipes/images/benchmark.jpg', ContentFile(make_image()))
+    Recipes.objects.bulk_create(
+        (Recipes(author=user, image=image, cooking_time=rnd.randint(5, 120),
+                 name=f'{rnd.choice(WORDS).capitalize()} {number}',
+                 text=' '.join(rnd.choices(WORDS, k=30)))
+         for user in user_list
+         for number in range(spread(recipes_per_user))))
+    recipe_ids = list(Recipes.objects.values_list('id', flat=True))
+
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=rnd.randint(1, 500))
+         for recipe_id in recipe_ids
+         for ingredient_id in rnd.sample(
+             ingredient_ids,
+             min(spread(ingredients_per_recipe), len(ingredient_ids)))))
+    RecipeTag.objects.bulk_create(
+        (RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in rnd.sample(tag_ids, rnd.randint(1, min(3, tags)))))
+
+    def per_user(model, field, mean, choices, exclude_self=False):
+        model.objects.bulk_create(
+            (model(user=user, **{field: choice})
+             for user in user_list
+             for choice in rnd.sample(
+                 choices, min(spread(mean), len(choices)))
+             if not (exclude_self and choice == user.id)))
+
+    per_user(Favorite, 'recipe_id', favorites_per_user, recipe_ids)
+    per_user(ShoppingCart, 'recipe_id', carts_per_user, recipe_ids)
+    per_user(Subscription, 'author_id', subscriptions_per_user,
+             [user.id for user in user_list], exclude_self=True)
+
+    reconcile_counters()
+    ShoppingListItem.objects.rebuild()
+    update_search_vector(Recipes.objects.all())
+    return user_list
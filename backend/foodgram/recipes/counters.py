@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Subscription
+from .models import Favorite, Recipes
+
+User = get_user_model()
+
+# (модель, поле-счётчик, считаемая модель, внешний ключ на модель)
+COUNTERS = (
+    (Recipes, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipes, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+def count_subquery(model, field):
+    """ Подзапрос COUNT(*) строк model, ссылающихся на внешнюю запись """
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def shift_counter(model, counter, pk, delta):
+    """ Сдвигает счётчик записи pk на delta, не опуская его ниже нуля """
+    model.objects.filter(pk=pk).update(
+        **{counter: Greatest(F(counter) + delta, 0)})
+
+
+def reconcile_counters(counters=COUNTERS, check=False):
+    """ Сверяет счётчики с фактическим числом строк и исправляет их.
+
+    Счётчики ведут сигналы, это страховка от расхождений после
+    массовых операций (update, raw SQL, загрузка фикстур).
+
+    Возвращает {поле: число расходящихся записей}; с check=True
+    только считает расхождения.
+    """
+    mismatched = {}
+    for model, counter, counted, field in counters:
+        actual = count_subquery(counted, field)
+        mismatched[counter] = model.objects.annotate(
+            actual=actual).exclude(**{counter: F('actual')}).count()
+        if mismatched[counter] and not check:
+            model.objects.update(**{counter: actual})
+    return mismatched
@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Размеры копий — двойные размеры карточки и страницы рецепта во фронтенде.
+RENDITIONS = {
+    'image_card': (726, 480),
+    'image_detail': (960, 960),
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='recipe-images')
+
+
+def encode(image, name):
+    """ Кодирует изображение в RECIPE_IMAGE_FORMAT без метаданных """
+    image_format = settings.RECIPE_IMAGE_FORMAT
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, format=image_format,
+               quality=settings.RECIPE_IMAGE_QUALITY, optimize=True)
+    return ContentFile(
+        buffer.getvalue(), name=f'{name}.{EXTENSIONS[image_format]}')
+
+
+def normalize_image(file):
+    """ Поворот по EXIF, уменьшение и перекодирование загруженного файла """
+    file.seek(0)
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.RECIPE_IMAGE_MAX_SIZE,) * 2)
+        name = os.path.splitext(os.path.basename(file.name))[0]
+        return encode(image, name)
+
+
+def make_renditions(recipe_id):
+    """ Создаёт копии изображения рецепта для карточки и страницы """
+    from recipes.models import Recipes
+
+    try:
+        recipe = Recipes.objects.get(pk=recipe_id)
+        original = recipe.image.name
+        name = os.path.splitext(os.path.basename(original))[0]
+        files = {}
+        with recipe.image.open('rb'), Image.open(recipe.image) as image:
+            image.load()
+            for field, size in RENDITIONS.items():
+                rendition = encode(
+                    ImageOps.fit(image, size, Image.LANCZOS),
+                    f'{name}_{size[0]}x{size[1]}')
+                files[field] = getattr(recipe, field).storage.save(
+                    getattr(recipe, field).field.generate_filename(
+                        recipe, rendition.name),
+                    rendition)
+        updated = Recipes.objects.filter(
+            pk=recipe_id, image=original).update(**files)
+        if not updated:
+            for path in files.values():
+                recipe.image.storage.delete(path)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения рецепта %s',
+                         recipe_id)
+
+
+def _make_renditions_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        make_renditions(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(recipe):
+    """ Ставит создание копий в очередь после коммита транзакции """
+    recipe_id = recipe.pk
+    if settings.RECIPE_IMAGE_RENDITIONS_ASYNC:
+        transaction.on_commit(
+            lambda: _executor.submit(_make_renditions_in_worker, recipe_id))
+    else:
+        transaction.on_commit(lambda: make_renditions(recipe_id))
@@ -1,21 +1,86 @@
 import csv
+import json
+import os
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from api.caching import bump_data_version
+from api.ingredient_search import reset_index
 from recipes.models import Ingredients
 
 
+def read_csv(path):
+    with open(path, encoding='utf8') as file:
+        for row in csv.reader(file):
+            yield row[:2] if len(row) >= 2 else None
+
+
+def read_json(path):
+    with open(path, encoding='utf8') as file:
+        for item in json.load(file):
+            try:
+                yield item['name'], item['measurement_unit']
+            except (KeyError, TypeError):
+                yield None
+
+
 class Command(BaseCommand):
+    help = 'Загрузка ингредиентов из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='./data/ingredients.csv',
+            help='Файл .csv (название,единица) или .json',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать изменения, ничего не записывая',
+        )
 
     def handle(self, *args, **options):
         """ Загрузка ингредиентов в Базу Данных"""
-        for data_object in csv.reader(
-                open('./data/ingredients.csv', encoding="utf8")):
-            ingredient = Ingredients(
-                name=data_object[0],
-                measurement_unit=data_object[1]
-            )
-            try:
-                ingredient.save()
-            except Exception as ex:
-                print(ex)
-        print('Upload successfully completed')
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        reader = read_json if path.endswith('.json') else read_csv
+        rows = reader(path)
+        seen = set(
+            Ingredients.objects.values_list('name', 'measurement_unit'))
+        inserted = skipped = 0
+        with transaction.atomic():
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                new = []
+                for row in batch:
+                    if row is None or not all(row):
+                        skipped += 1
+                        continue
+                    key = (row[0].strip(), row[1].strip())
+                    if key in seen:
+                        skipped += 1
+                        continue
+                    seen.add(key)
+                    new.append(Ingredients(
+                        name=key[0], measurement_unit=key[1]))
+                inserted += len(new)
+                if new and not options['dry_run']:
+                    Ingredients.objects.bulk_create(
+                        new, ignore_conflicts=True)
+        if inserted and not options['dry_run']:
+            bump_data_version('ingredients')
+            reset_index()
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(
+            f'{prefix}inserted: {inserted}, updated: 0, skipped: {skipped}')
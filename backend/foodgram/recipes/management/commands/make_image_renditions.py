@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from recipes.images import make_renditions
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    help = 'Создание копий изображений для рецептов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipes.objects.all()
+        if not options['all']:
+            recipes = recipes.filter(image_card='')
+        count = 0
+        for recipe_id in list(recipes.values_list('id', flat=True)):
+            make_renditions(recipe_id)
+            count += 1
+        self.stdout.write(f'Обработано рецептов: {count}')
@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересборка и проверка предрасчитанных списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить списки с корзинами, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        """ Пересборка списков покупок из корзин пользователей """
+        if not options['check']:
+            ShoppingListItem.objects.rebuild()
+        live = {
+            (row['recipe__carts__user'], row['ingredient']): row['total']
+            for row in RecipeIngredient.objects.filter(
+                recipe__carts__isnull=False
+            ).values('recipe__carts__user', 'ingredient').annotate(
+                total=Sum('amount')).iterator()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount').iterator()
+        }
+        mismatched = {
+            key for key in live.keys() | stored.keys()
+            if live.get(key) != stored.get(key)
+        }
+        if mismatched:
+            raise CommandError(
+                f'Списки покупок расходятся с корзинами: '
+                f'{len(mismatched)} позиций')
+        self.stdout.write(f'Списки покупок совпадают: {len(stored)} позиций')
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверка и исправление счётчиков избранного, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить счётчики с данными, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        """ Пересчёт денормализованных счётчиков """
+        mismatched = reconcile_counters(check=options['check'])
+        report = ', '.join(
+            f'{counter}: {count}' for counter, count in mismatched.items())
+        if not options['check']:
+            self.stdout.write(f'Исправлено записей: {report}')
+        elif any(mismatched.values()):
+            raise CommandError(f'Счётчики расходятся с данными: {report}')
+        else:
+            self.stdout.write('Счётчики совпадают с данными')
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:00
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredients = apps.get_model('recipes', 'Ingredients')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    kept, duplicates = {}, {}
+    for pk, name, unit in Ingredients.objects.order_by('id').values_list(
+            'id', 'name', 'measurement_unit'):
+        if (name, unit) in kept:
+            duplicates[pk] = kept[(name, unit)]
+        else:
+            kept[(name, unit)] = pk
+    for duplicate, original in duplicates.items():
+        RecipeIngredient.objects.filter(
+            ingredient_id=duplicate).update(ingredient_id=original)
+    for item in ShoppingListItem.objects.filter(
+            ingredient_id__in=duplicates):
+        target, _ = ShoppingListItem.objects.get_or_create(
+            user_id=item.user_id,
+            ingredient_id=duplicates[item.ingredient_id],
+            defaults={'amount': 0})
+        target.amount += item.amount
+        target.save()
+        item.delete()
+    Ingredients.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_name_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredients',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+
+def remove_duplicate_rows(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    using = schema_editor.connection.alias
+
+    # Дубликаты ингредиентов складываются в строку с меньшим id.
+    duplicates = list(
+        RecipeIngredient.objects.using(using).order_by().values(
+            'recipe', 'ingredient'
+        ).annotate(
+            models.Count('id'),
+            keep=models.Min('id'),
+            total=models.Sum('amount'),
+        ).filter(id__count__gt=1))
+    for row in duplicates:
+        rows = RecipeIngredient.objects.using(using).filter(
+            recipe=row['recipe'], ingredient=row['ingredient'])
+        rows.filter(pk=row['keep']).update(amount=row['total'])
+        rows.exclude(pk=row['keep']).delete()
+
+    duplicates = list(
+        ShoppingCart.objects.using(using).order_by().values(
+            'user', 'recipe'
+        ).annotate(
+            models.Count('id'),
+            keep=models.Min('id'),
+        ).filter(id__count__gt=1))
+    for row in duplicates:
+        ShoppingCart.objects.using(using).filter(
+            user=row['user'], recipe=row['recipe']
+        ).exclude(pk=row['keep']).delete()
+
+    # Слияние ингредиентов не меняет сумм, а лишние корзины меняют.
+    users = {row['user'] for row in duplicates}
+    if users:
+        ShoppingListItem.objects.using(using).filter(
+            user_id__in=users).delete()
+        totals = RecipeIngredient.objects.using(using).filter(
+            recipe__carts__user_id__in=users
+        ).values('recipe__carts__user', 'ingredient').annotate(
+            total=models.Sum('amount'))
+        ShoppingListItem.objects.using(using).bulk_create(
+            (ShoppingListItem(user_id=row['recipe__carts__user'],
+                              ingredient_id=row['ingredient'],
+                              amount=row['total'])
+             for row in totals),
+            # Не больше 999 параметров на запрос, как требует SQLite.
+            batch_size=300)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipes',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipe_tag_tag_recipe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='image_card',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Изображение для карточки'),
+        ),
+        migrations.AddField(
+            model_name='recipes',
+            name='image_detail',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Изображение для страницы рецепта'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import migrations, models
+
+INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector_idx')
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('recipes', 'Recipes'), INDEX)
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('recipes', 'Recipes'), INDEX)
+
+
+def fill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipes = apps.get_model('recipes', 'Recipes')
+    recipes = Recipes.objects.using(schema_editor.connection.alias)
+    ingredient_names = recipes.filter(
+        pk=models.OuterRef('pk')
+    ).order_by().values('pk').annotate(
+        names=StringAgg('ingredients__name', ' ')
+    ).values('names')
+    SearchVector = django.contrib.postgres.search.SearchVector
+    recipes.update(search_vector=(
+        SearchVector('name', weight='A', config='russian')
+        + SearchVector('text', weight='B', config='russian')
+        + SearchVector(models.Subquery(ingredient_names,
+                                       output_field=models.TextField()),
+                       weight='C', config='russian')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='recipes', index=INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_index, remove_index),
+            ],
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:10
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipes = apps.get_model('recipes', 'Recipes')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Subscription = apps.get_model('users', 'Subscription')
+    using = schema_editor.connection.alias
+    for model, counter, counted, field in (
+        (Recipes, 'favorites_count', Favorite, 'recipe'),
+        (CustomUser, 'recipes_count', Recipes, 'author'),
+        (CustomUser, 'subscribers_count', Subscription, 'author'),
+    ):
+        model.objects.using(using).update(**{counter: Coalesce(
+            models.Subquery(
+                counted.objects.filter(**{field: models.OuterRef('pk')})
+                .order_by().values(field)
+                .annotate(total=models.Count('pk')).values('total'),
+                output_field=models.IntegerField()),
+            0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_search_vector'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddIndex(
+            model_name='recipes',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:27
+
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX ingredient_name_lower_idx ON recipes_ingredients '
+            '(lower(name) varchar_pattern_ops)')
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX ingredient_name_lower_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredients',
+            name='ingredient_name_prefix_idx',
+        ),
+        migrations.RunPython(create_index, remove_index),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 
@@ -19,6 +21,18 @@ class Ingredients(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'name',
+                    'measurement_unit',
+                ),
+                name='unique_ingredient',
+            ),
+        )
+        # Индекс ingredient_name_lower_idx по lower(name) для поиска по
+        # началу названия создаётся в миграции 0011: Django 2.2 не
+        # поддерживает индексы по выражениям.
 
     def __str__(self):
         return self.name
@@ -69,6 +83,16 @@ class Recipes(models.Model):
         'Изображение',
         upload_to='recipes/images/',
     )
+    image_card = models.ImageField(
+        'Изображение для карточки',
+        upload_to='recipes/renditions/',
+        blank=True,
+    )
+    image_detail = models.ImageField(
+        'Изображение для страницы рецепта',
+        upload_to='recipes/renditions/',
+        blank=True,
+    )
     pub_date = models.DateTimeField(
         'Время публикации',
         auto_now_add=True
@@ -88,11 +112,39 @@ class Recipes(models.Model):
         Tag,
         through='RecipeTag'
     )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_favorites_count_idx',
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -113,6 +165,15 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент для рецепта'
         verbose_name_plural = 'Ингредиенты для рецепта'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'recipe',
+                    'ingredient',
+                ),
+                name='unique_recipe_ingredient',
+            ),
+        )
 
     def __str__(self):
         return f'{self.recipe} {self.ingredient}'
@@ -126,6 +187,12 @@ class RecipeTag(models.Model):
     class Meta:
         verbose_name = 'Тэг рецепта'
         verbose_name_plural = 'Тэги рецептов'
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe'),
+                name='recipe_tag_tag_recipe_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.recipe} {self.tag}'
@@ -183,3 +250,136 @@ class ShoppingCart(models.Model):
         ordering = ('id',)
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'recipe',
+                ),
+                name='unique_shopping_cart',
+            ),
+        )
+
+
+class ShoppingListItemManager(models.Manager):
+    """ Поддержка предрасчитанных списков покупок.
+
+    Изменения корзин и ингредиентов рецептов через save()/delete()
+    учитывают сигналы api.signals; массовые операции (bulk_create,
+    bulk_update, update) должны вызывать update_amounts сами.
+    """
+
+    def update_amounts(self, user_ids, deltas):
+        """ Прибавляет deltas {ingredient_id: amount} к спискам users """
+        user_ids = set(user_ids)
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            # select_for_update не блокирует ещё не созданные позиции,
+            # поэтому параллельные изменения списков одного пользователя
+            # упорядочиваются блокировкой его строки.
+            list(User.objects.select_for_update().filter(
+                pk__in=user_ids).order_by('pk').values_list('pk'))
+            items = {
+                (item.user_id, item.ingredient_id): item
+                for item in self.select_for_update().filter(
+                    user_id__in=user_ids, ingredient_id__in=deltas)
+            }
+            changed, created, emptied = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, delta in deltas.items():
+                    item = items.get((user_id, ingredient_id))
+                    if item is None:
+                        if delta > 0:
+                            created.append(self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta))
+                        continue
+                    item.amount += delta
+                    if item.amount > 0:
+                        changed.append(item)
+                    else:
+                        emptied.append(item.id)
+            if changed:
+                self.bulk_update(changed, ['amount'])
+            if created:
+                self.bulk_create(created)
+            if emptied:
+                self.filter(id__in=emptied).delete()
+
+    def update_recipe_amounts(self, recipe, deltas):
+        """ Прибавляет deltas к спискам всех, у кого recipe в корзине """
+        self.update_amounts(
+            ShoppingCart.objects.filter(recipe=recipe)
+            .values_list('user_id', flat=True),
+            deltas)
+
+    def add_recipe(self, user_ids, recipe, sign=1):
+        """ Добавляет ингредиенты рецепта в списки покупок users """
+        deltas = {}
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe=recipe).values_list('ingredient_id', 'amount'):
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + amount
+        self.update_amounts(
+            user_ids, {pk: sign * amount for pk, amount in deltas.items()})
+
+    def remove_recipe(self, user_ids, recipe):
+        """ Убирает ингредиенты рецепта из списков покупок users """
+        self.add_recipe(user_ids, recipe, sign=-1)
+
+    def rebuild(self, user_ids=None):
+        """ Пересобирает списки покупок из корзин """
+        totals = RecipeIngredient.objects.filter(recipe__carts__isnull=False)
+        if user_ids is not None:
+            totals = totals.filter(recipe__carts__user_id__in=user_ids)
+        totals = totals.values(
+            'recipe__carts__user', 'ingredient'
+        ).annotate(total=models.Sum('amount'))
+        with transaction.atomic():
+            items = self.all()
+            if user_ids is not None:
+                items = items.filter(user_id__in=user_ids)
+            items.delete()
+            self.bulk_create(
+                (self.model(user_id=row['recipe__carts__user'],
+                            ingredient_id=row['ingredient'],
+                            amount=row['total'])
+                 for row in totals.iterator()),
+                # Не больше 999 параметров на запрос, как требует SQLite.
+                batch_size=300)
+
+
+class ShoppingListItem(models.Model):
+    """ Предрасчитанная позиция списка покупок пользователя """
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    'user',
+                    'ingredient',
+                ),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount}'
@@ -0,0 +1,93 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery, TextField
+
+SEARCH_CONFIG = 'russian'
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def update_search_vector(recipes):
+    """ Пересчитывает поисковый вектор у рецептов из queryset recipes:
+    название (вес A), описание (B) и названия ингредиентов (C).
+    """
+    if not is_postgresql(recipes):
+        return
+    ingredient_names = recipes.model.objects.filter(
+        pk=OuterRef('pk')
+    ).order_by().values('pk').annotate(
+        names=StringAgg('ingredients__name', ' ')
+    ).values('names')
+    recipes.update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(ingredient_names, output_field=TextField()),
+                       weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+class PendingSearchVectors:
+    """ Рецепты, вектор которых пересчитывается после коммита """
+
+    def __init__(self, using):
+        self.using = using
+        self.recipe_ids = set()
+
+    def __call__(self):
+        from recipes.models import Recipes
+
+        if self.recipe_ids:
+            update_search_vector(Recipes.objects.using(self.using).filter(
+                pk__in=self.recipe_ids))
+
+
+def find_pending_search_vectors(connection):
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], PendingSearchVectors):
+            return entry[1]
+    return None
+
+
+def schedule_search_vector_update(recipe_id, using=None):
+    """ Пересчитывает вектор рецепта после коммита транзакции.
+
+    Все рецепты одной транзакции пересчитываются одним запросом;
+    вне транзакции — сразу.
+    """
+    connection = transaction.get_connection(using)
+    pending = find_pending_search_vectors(connection)
+    if pending is not None:
+        pending.recipe_ids.add(recipe_id)
+        return
+    pending = PendingSearchVectors(connection.alias)
+    pending.recipe_ids.add(recipe_id)
+    transaction.on_commit(pending, using=connection.alias)
+
+
+def cancel_search_vector_update(recipe_id, using=None):
+    """ Не пересчитывать вектор удаляемого рецепта """
+    pending = find_pending_search_vectors(
+        transaction.get_connection(using))
+    if pending is not None:
+        pending.recipe_ids.discard(recipe_id)
+
+
+def search_recipes(queryset, text):
+    """ Полнотекстовый поиск с ранжированием; вне Postgres — icontains """
+    from recipes.models import RecipeIngredient
+
+    if is_postgresql(queryset):
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+    return queryset.filter(
+        Q(name__icontains=text)
+        | Q(text__icontains=text)
+        | Q(id__in=RecipeIngredient.objects.filter(
+            ingredient__name__icontains=text).values('recipe_id'))
+    )
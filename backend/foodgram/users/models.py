@@ -31,6 +31,16 @@ class CustomUser(AbstractUser):
             message='Недопустимые символы')
         ]
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['id']